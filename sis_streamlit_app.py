@@ -5,6 +5,7 @@ import time, json, math, random
 from typing import List, Dict, Any
 import streamlit as st
 import pandas as pd
+import numpy as np
 
 st.set_page_config(page_title="SCADA SIS — Smart‑relay", layout="wide")
 
@@ -12,18 +13,151 @@ STATE = ("IDLE","PREHEAT","CRANK","RUN","COOLDOWN","FAULT")
 ALT_TARGET = 13.8
 BAT_MIN = 11.8
 MAX_ATT = 3
+SHORT_CYCLE_S = 120
+TREND_ALPHA = 0.2
+
+CFG_DEFAULT = {
+    "TEMP_START": 18,
+    "DT": 2,
+    "MIN_RUNTIME_S": 60,
+    "START_DEBOUNCE": 3,
+    "STOP_DEBOUNCE": 5,
+    "noise": False,
+    "fast": False,
+    "predictive": False,
+}
+
+# Config schema: key -> (type, min, max, step). The UI sliders are built from it.
+CFG_SCHEMA = {
+    "TEMP_START": (int, 5, 25, 1),
+    "DT": (int, 1, 10, 1),
+    "MIN_RUNTIME_S": (int, 10, 300, 10),
+    "START_DEBOUNCE": (int, 1, 10, 1),
+    "STOP_DEBOUNCE": (int, 1, 15, 1),
+    "noise": (bool, None, None, None),
+    "fast": (bool, None, None, None),
+    "predictive": (bool, None, None, None),
+}
+
+def _compile_validator(key: str, typ, lo, hi, step):
+    if typ is bool:
+        def check(v):
+            if not isinstance(v, bool):
+                return f"{key}: se esperaba booleano, recibido {v!r}"
+        return check
+    def check(v):
+        if isinstance(v, bool) or not isinstance(v, typ):
+            return f"{key}: se esperaba {typ.__name__}, recibido {v!r}"
+        if not lo <= v <= hi:
+            return f"{key}: {v} fuera de rango [{lo}, {hi}]"
+        if (v - lo) % step:
+            return f"{key}: {v} no es múltiplo del paso {step} desde {lo}"
+    return check
+
+CFG_VALIDATORS = {k: _compile_validator(k, *spec) for k, spec in CFG_SCHEMA.items()}
+
+def validate_cfg(cfg_in: Any) -> List[str]:
+    """Check a (possibly partial) config against CFG_SCHEMA; returns the error list."""
+    if not isinstance(cfg_in, dict):
+        return [f"Se esperaba un objeto JSON, recibido {type(cfg_in).__name__}"]
+    errors = []
+    for k, v in cfg_in.items():
+        check = CFG_VALIDATORS.get(k)
+        if check is None:
+            errors.append(f"{k}: clave desconocida")
+            continue
+        err = check(v)
+        if err:
+            errors.append(err)
+    return errors
+
+def cfg_diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"Clave": k, "Actual": old.get(k), "Nuevo": v} for k, v in new.items() if old.get(k) != v]
+
+def resolve_cfg_set(units: Dict[str, Any], sets: Dict[str, Any]):
+    """Resolve and validate a config set; returns (unit -> config, errors).
+
+    ``units`` maps unit id -> config dict or name of an entry in ``sets``.
+    Each distinct config is validated once.
+    """
+    if not isinstance(units, dict) or not isinstance(sets, dict):
+        return {}, ["'units' y 'sets' deben ser objetos JSON"]
+    checked: Dict[str, List[str]] = {}
+    resolved = {}
+    errors = []
+    for unit, ref in units.items():
+        if isinstance(ref, str):
+            if ref not in sets:
+                errors.append(f"{unit}: conjunto '{ref}' no definido")
+                continue
+            ref = sets[ref]
+        key = json.dumps(ref, sort_keys=True)
+        if key not in checked:
+            checked[key] = validate_cfg(ref)
+        errors += [f"{unit}: {e}" for e in checked[key]]
+        resolved[unit] = ref
+    return resolved, errors
+
+def cfg_set_diff(fleet: Dict[str, Dict[str, Any]], resolved: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"Unidad": unit, **row} for unit, ref in resolved.items()
+            for row in cfg_diff(fleet.get(unit, CFG_DEFAULT), ref)]
+
+def apply_cfg_set(fleet: Dict[str, Dict[str, Any]], units: Dict[str, Any], sets: Dict[str, Any]) -> List[str]:
+    """Apply configs to many units in one transaction.
+
+    If any config fails validation nothing is applied. Units not yet in the
+    fleet start from CFG_DEFAULT.
+    """
+    resolved, errors = resolve_cfg_set(units, sets)
+    if errors:
+        return errors
+    for unit, ref in resolved.items():
+        # update in place so the local unit keeps sharing st.session_state.cfg
+        fleet.setdefault(unit, dict(CFG_DEFAULT)).update(ref)
+    return []
+
+# Seeded random streams (sensor noise, crank sag) drawn from pre-generated
+# blocks. Each stream has its own generator spawned from the unit seed, so
+# toggling noise does not shift the sag sequence. ``offsets`` seeks each stream
+# to a logged draw count by regenerating the same blocks.
+RNG_BLOCK = 1024
+RNG_STREAMS = {"noise": (-0.2, 0.2), "sag": (0.6, 0.8)}
+
+def rng_seed(seed=None, offsets: Dict[str, int]=None) -> int:
+    if seed is None:
+        seed = random.randrange(2**32)
+    offsets = offsets or {}
+    gens = [np.random.default_rng(ss) for ss in np.random.SeedSequence(seed).spawn(len(RNG_STREAMS))]
+    st.session_state.rng = {"seed": seed}
+    for name, gen in zip(RNG_STREAMS, gens):
+        n = offsets.get(name, 0)
+        stream = {"gen": gen, "block": [], "pos": 0, "n": n}
+        for _ in range(n // RNG_BLOCK):
+            gen.uniform(*RNG_STREAMS[name], RNG_BLOCK)
+        if n % RNG_BLOCK:
+            stream["block"] = gen.uniform(*RNG_STREAMS[name], RNG_BLOCK).tolist()
+            stream["pos"] = n % RNG_BLOCK
+        st.session_state.rng[name] = stream
+    return seed
+
+def rng_pos() -> Dict[str, int]:
+    return {name: st.session_state.rng[name]["n"] for name in RNG_STREAMS}
+
+def rng_draw(name: str) -> float:
+    s = st.session_state.rng[name]
+    if s["pos"] >= len(s["block"]):
+        s["block"] = s["gen"].uniform(*RNG_STREAMS[name], RNG_BLOCK).tolist()
+        s["pos"] = 0
+    v = s["block"][s["pos"]]
+    s["pos"] += 1
+    s["n"] += 1
+    return v
 
 def bootstrap():
     if "cfg" not in st.session_state:
-        st.session_state.cfg = {
-            "TEMP_START": 18,
-            "DT": 2,
-            "MIN_RUNTIME_S": 60,
-            "START_DEBOUNCE": 3,
-            "STOP_DEBOUNCE": 5,
-            "noise": False,
-            "fast": False,
-        }
+        st.session_state.cfg = dict(CFG_DEFAULT)
+    if "fleet" not in st.session_state:
+        st.session_state.fleet = {"LOCAL": st.session_state.cfg}
     if "sim" not in st.session_state:
         st.session_state.sim = {
             "temp": 22.0,
@@ -39,9 +173,34 @@ def bootstrap():
             "faultAltKO": False,
             "faultStartStuck": False,
             "faultSensorBias": 0.0,
+            "trendLevel": None,
+            "trendSlope": 0.0,
+            "cycleSnap": None,
+            "startPredictive": False,
+            "startMode": None,
+            "startTick": None,
+            "crossed": False,
             "hist": [],
             "alarms": [],
         }
+    if "kpi" not in st.session_state:
+        st.session_state.kpi = {
+            "ticks": 0,
+            "run_s": 0,
+            "low_bat_s": 0,
+            "starts": 0,
+            "failed": 0,
+            "cycles": 0,
+            "cycle_open": False,
+            "a002": 0,
+            "last_start": None,
+            "start_gap_sum": 0,
+            "last_stop": None,
+            "short_cycles": 0,
+            "lead": {m: {"n": 0, "sum": 0, "false": 0} for m in ("reactive","predictive")},
+        }
+    if "rng" not in st.session_state:
+        rng_seed()
     if "last_tick" not in st.session_state:
         st.session_state.last_tick = 0.0
 
@@ -53,24 +212,56 @@ def log(msg: str, level: str="info"):
 def to(state: str):
     st.session_state.sim["fsm"] = state
 
-def start_seq():
+def tick_s(cfg) -> float:
+    return 1.0/(2 if cfg["fast"] else 1)
+
+def preheat_s(cfg) -> float:
+    return 4 if cfg["fast"] else 8
+
+def crank_s(cfg) -> float:
+    return 1.5 if cfg["fast"] else 3.0
+
+# Sim fields captured when a MAX_ATT cycle opens; with the seed, the stream
+# positions and cfg they are enough to restart the cycle in replay_cycle().
+SNAP_SIM_KEYS = ("temp","vbat","faultSensorBias","faultAltKO","faultStartStuck","auto",
+                 "attempts","startCounter","trendLevel","trendSlope")
+
+def cycle_snapshot(mode) -> Dict[str, Any]:
+    sim = st.session_state.sim
+    snap = {k: sim[k] for k in SNAP_SIM_KEYS}
+    snap.update(
+        seed=st.session_state.rng["seed"],
+        rng=rng_pos(),
+        shown=sim["hist"][-1] if sim["hist"] else sim["temp"]+sim["faultSensorBias"],
+        mode=mode,
+        cfg=dict(st.session_state.cfg),
+    )
+    return snap
+
+def start_seq(mode=None):
     sim, cfg = st.session_state.sim, st.session_state.cfg
     if sim["vbat"] < BAT_MIN:
         log("A001 Batería baja. Arranque cancelado.","err")
+        kpi_cycle_close()
         to("IDLE")
         return
+    if not st.session_state.kpi["cycle_open"]:
+        # a new MAX_ATT cycle: the FSM retry count and the KPI cycle start together
+        sim["attempts"] = 0
+        sim["cycleSnap"] = cycle_snapshot(mode)
     sim["attempts"] += 1
+    kpi_attempt()
     to("PREHEAT")
     log("Precalentando bujías","info")
-    sim["preheat_until"] = time.time() + (4 if cfg["fast"] else 8)
+    sim["preheat_until"] = time.time() + preheat_s(cfg)
 
 def crank():
     sim, cfg = st.session_state.sim, st.session_state.cfg
     to("CRANK")
-    sag = 0.6 + random.random()*0.2
+    sag = rng_draw("sag")
     sim["vbat"] = max(10.8, sim["vbat"] - sag)
     log("Motor de arranque ACTIVADO","info")
-    sim["crank_until"] = time.time() + (1.5 if cfg["fast"] else 3.0)
+    sim["crank_until"] = time.time() + crank_s(cfg)
 
 def run():
     sim = st.session_state.sim
@@ -79,7 +270,9 @@ def run():
     sim["alternator"] = not sim["faultAltKO"]
     sim["runTime"] = 0
     sim["startCounter"] = 0
+    sim["startPredictive"] = False
     sim["stopCounter"] = 0
+    kpi_run()
     log(f"Motor en marcha. Alternador {'ON' if sim['alternator'] else 'KO'}.","ok")
 
 def stop(by_user=False):
@@ -89,30 +282,180 @@ def stop(by_user=False):
         return
     sim["rpm"] = 0
     sim["alternator"] = False
+    if sim["fsm"] == "RUN":
+        kpi_stop()
+    else:
+        # stop during PREHEAT/CRANK (or a pending retry) ends the start cycle
+        sim["retry_at"] = None
+        kpi_cycle_close()
+    lead_close()
     to("COOLDOWN")
     log("Motor detenido","ok")
     sim["cooldown_until"] = time.time() + 0.8
 
+# Online operating KPIs: counters/sums updated in O(1) per tick and transition.
+# Time is measured in ticks (1 tick = 1 s simulated, as runTime).
+def kpi_attempt():
+    kpi = st.session_state.kpi
+    if not kpi["cycle_open"]:
+        kpi["cycle_open"] = True
+        kpi["cycles"] += 1
+
+def kpi_cycle_close(a002=False, discard=False):
+    kpi = st.session_state.kpi
+    if discard and kpi["cycle_open"]:
+        kpi["cycles"] -= 1
+    kpi["cycle_open"] = False
+    if a002:
+        kpi["a002"] += 1
+
+def kpi_run():
+    kpi = st.session_state.kpi
+    now = kpi["ticks"]
+    kpi["starts"] += 1
+    if kpi["last_start"] is not None:
+        kpi["start_gap_sum"] += now - kpi["last_start"]
+    kpi["last_start"] = now
+    if kpi["last_stop"] is not None and now - kpi["last_stop"] < SHORT_CYCLE_S:
+        kpi["short_cycles"] += 1
+        log(f"Ciclo corto: rearranque {now-kpi['last_stop']}s tras paro","warn")
+    kpi_cycle_close()
+
+def kpi_stop():
+    st.session_state.kpi["last_stop"] = st.session_state.kpi["ticks"]
+
+def kpi_tick():
+    sim, kpi = st.session_state.sim, st.session_state.kpi
+    kpi["ticks"] += 1
+    if sim["fsm"]=="RUN":
+        kpi["run_s"] += 1
+    if sim["vbat"] < BAT_MIN:
+        kpi["low_bat_s"] += 1
+
+def kpi_summary() -> Dict[str, Any]:
+    kpi = st.session_state.kpi
+    return {
+        "run_h": kpi["run_s"]/3600,
+        "starts": kpi["starts"],
+        "failed_per_cycle": kpi["failed"]/kpi["cycles"] if kpi["cycles"] else 0.0,
+        "a002": kpi["a002"],
+        "mtbs_s": kpi["start_gap_sum"]/(kpi["starts"]-1) if kpi["starts"] > 1 else None,
+        "duty": kpi["run_s"]/kpi["ticks"] if kpi["ticks"] else 0.0,
+        "low_bat_s": kpi["low_bat_s"],
+        "short_cycles": kpi["short_cycles"],
+    }
+
+# Temperature trend: Holt double exponential smoothing (level + per-tick slope),
+# O(1) per sample. Projecting the level by the slope keeps it on a steady ramp
+# instead of lagging (1-α)/α ticks behind it.
+def trend_update(shown: float):
+    sim = st.session_state.sim
+    if sim["trendLevel"] is None:
+        sim["trendLevel"] = shown
+        return
+    prev = sim["trendLevel"]
+    sim["trendLevel"] = TREND_ALPHA*shown + (1-TREND_ALPHA)*(prev + sim["trendSlope"])
+    sim["trendSlope"] = TREND_ALPHA*(sim["trendLevel"]-prev) + (1-TREND_ALPHA)*sim["trendSlope"]
+
+def trend_forecast(cfg, horizon_s: float=None) -> float:
+    # Forecast horizon_s ahead (default: end of PREHEAT+CRANK), expressed in ticks.
+    sim = st.session_state.sim
+    if horizon_s is None:
+        horizon_s = preheat_s(cfg) + crank_s(cfg)
+    return sim["trendLevel"] + sim["trendSlope"]*horizon_s/tick_s(cfg)
+
+def predictive_abort(msg: str):
+    # Forecast miss: back to IDLE as a predictive false start, not a start failure.
+    sim = st.session_state.sim
+    log(msg,"warn")
+    lead_close()
+    sim["startCounter"] = 0
+    sim["startPredictive"] = False
+    to("IDLE")
+
+# Lead time = ticks from the auto start request to the first reading <= TEMP_START
+# (negative for reactive starts). A start whose cycle ends without that crossing
+# counts as a false start.
+# A start is predictive if any reading counted by the debounce was a forecast only.
+def lead_open(mode: str, shown: float):
+    sim, cfg = st.session_state.sim, st.session_state.cfg
+    sim["startMode"] = mode
+    sim["startTick"] = st.session_state.kpi["ticks"]
+    sim["crossed"] = False
+    if mode == "reactive":
+        # reactive requests follow START_DEBOUNCE readings below the threshold
+        lead_cross(-(cfg["START_DEBOUNCE"]-1))
+    elif shown <= cfg["TEMP_START"]:
+        lead_cross(0)
+
+def lead_cross(lead: int):
+    sim = st.session_state.sim
+    stats = st.session_state.kpi["lead"][sim["startMode"]]
+    stats["n"] += 1
+    stats["sum"] += lead
+    sim["crossed"] = True
+
+def lead_close():
+    sim = st.session_state.sim
+    if sim["startMode"] and not sim["crossed"]:
+        st.session_state.kpi["lead"][sim["startMode"]]["false"] += 1
+        log(f"Arranque sin cruce de consigna ({sim['startMode']})","warn")
+    sim["startMode"] = None
+    sim["startTick"] = None
+
+def lead_summary() -> Dict[str, Any]:
+    out = {}
+    for mode, stats in st.session_state.kpi["lead"].items():
+        total = stats["n"] + stats["false"]
+        out[mode] = {
+            "starts": total,
+            "lead_s": stats["sum"]/stats["n"] if stats["n"] else None,
+            "false_rate": stats["false"]/total if total else 0.0,
+        }
+    return out
+
 def tick():
     sim, cfg = st.session_state.sim, st.session_state.cfg
     now = time.time()
 
     if sim.get("preheat_until") and now >= sim["preheat_until"] and sim["fsm"]=="PREHEAT":
         sim["preheat_until"] = None
-        crank()
+        shown_last = sim["hist"][-1] if sim["hist"] else sim["temp"]+sim["faultSensorBias"]
+        if (sim["startMode"]=="predictive" and not sim["crossed"] and shown_last > cfg["TEMP_START"]
+                and trend_forecast(cfg, crank_s(cfg)) > cfg["TEMP_START"]):
+            # re-check before the starter engages; this preheat does not count toward MAX_ATT
+            sim["attempts"] -= 1
+            if sim["attempts"] == 0:
+                kpi_cycle_close(discard=True)
+            predictive_abort("Arranque predictivo abortado antes de arrancar: previsión no confirmada")
+        else:
+            crank()
     if sim.get("crank_until") and now >= sim["crank_until"] and sim["fsm"]=="CRANK":
         sim["crank_until"] = None
-        success = (not sim["faultStartStuck"]) and sim["vbat"]>11.6 and (sim["temp"]+sim["faultSensorBias"]) <= cfg["TEMP_START"]+1.0
+        temp_ok = (sim["temp"]+sim["faultSensorBias"]) <= cfg["TEMP_START"]+1.0
+        success = (not sim["faultStartStuck"]) and sim["vbat"]>11.6 and temp_ok
         if success:
             run()
+        elif not temp_ok and sim["startMode"]=="predictive" and not sim["crossed"]:
+            # the crank happened and keeps its count: the cycle stays open, no retry, no A002
+            predictive_abort("Arranque predictivo abortado: la temperatura no alcanzó la consigna")
+            if sim["attempts"] >= MAX_ATT:
+                # lock out anticipation until a real crossing starts a new cycle
+                kpi_cycle_close()
+                to("FAULT")
+                log(f"Arranque predictivo bloqueado: {MAX_ATT} intentos sin cruce de consigna","warn")
         else:
             log("Arranque fallido","warn")
+            st.session_state.kpi["failed"] += 1
             if sim["attempts"] < MAX_ATT:
                 sim["retry_at"] = now + 5.0
                 log(f"Reintento {sim['attempts']+1}/{MAX_ATT} en 5s","warn")
             else:
                 to("FAULT")
-                log("A002 Fallo de arranque","err")
+                kpi_cycle_close(a002=True)
+                lead_close()
+                st.session_state.last_a002 = sim["cycleSnap"]
+                log(f"A002 Fallo de arranque | replay={json.dumps(sim['cycleSnap'])}","err")
     if sim.get("retry_at") and now >= sim["retry_at"] and sim["fsm"] in ("IDLE","FAULT","CRANK","PREHEAT"):
         sim["retry_at"] = None
         start_seq()
@@ -121,9 +464,14 @@ def tick():
         sim["cooldown_until"] = None
         to("IDLE")
 
-    shown = (sim["temp"] + sim["faultSensorBias"]) + (random.random()*0.4-0.2 if st.session_state.cfg["noise"] else 0.0)
+    shown = (sim["temp"] + sim["faultSensorBias"]) + (rng_draw("noise") if st.session_state.cfg["noise"] else 0.0)
     sim["hist"].append(shown)
     sim["hist"] = sim["hist"][-600:]
+    trend_update(shown)
+
+    kpi_tick()
+    if sim["startMode"] and not sim["crossed"] and shown <= cfg["TEMP_START"]:
+        lead_cross(st.session_state.kpi["ticks"] - sim["startTick"])
 
     if sim["fsm"]=="RUN":
         sim["runTime"] += 1
@@ -138,14 +486,49 @@ def tick():
     else:
         sim["vbat"] = max(10.8, sim["vbat"] - 0.001)
         if sim["auto"] and sim["fsm"] in ("IDLE","FAULT"):
-            if shown <= cfg["TEMP_START"]:
+            anticipate = cfg["predictive"] and sim["fsm"]=="IDLE" and sim["trendSlope"] < 0 and trend_forecast(cfg) <= cfg["TEMP_START"]
+            if shown <= cfg["TEMP_START"] or anticipate:
                 sim["startCounter"] += 1
+                sim["startPredictive"] |= shown > cfg["TEMP_START"]
             else:
                 sim["startCounter"] = 0
+                sim["startPredictive"] = False
             if sim["startCounter"] >= cfg["START_DEBOUNCE"]:
                 if sim["fsm"]=="FAULT":
                     sim["attempts"] = 0
-                start_seq()
+                mode = "predictive" if sim["startPredictive"] else "reactive"
+                start_seq(mode)
+                if sim["fsm"]=="PREHEAT":
+                    lead_close()
+                    lead_open(mode, shown)
+                    sim["startPredictive"] = False
+
+def replay_cycle(snap: Dict[str, Any]):
+    """Restart a logged MAX_ATT cycle from its snapshot.
+
+    The real KPIs are set aside in ``kpi_real`` until end_replay(); the
+    replay accumulates into a fresh KPI store. FSM timers use time.time(),
+    so only the random draws and the starting state are reproduced exactly.
+    """
+    if "kpi_real" not in st.session_state:
+        st.session_state.kpi_real = st.session_state.kpi
+    alarms = st.session_state.sim["alarms"]
+    del st.session_state["sim"], st.session_state["kpi"]
+    bootstrap()
+    sim = st.session_state.sim
+    sim["alarms"] = alarms
+    st.session_state.cfg.update(snap["cfg"])
+    for k in SNAP_SIM_KEYS:
+        sim[k] = snap[k]
+    rng_seed(snap["seed"], snap["rng"])
+    log(f"Reproducción: seed={snap['seed']}, sag#{snap['rng']['sag']}, noise#{snap['rng']['noise']}","info")
+    start_seq(snap["mode"])
+    if sim["fsm"]=="PREHEAT" and snap["mode"]:
+        lead_open(snap["mode"], snap["shown"])
+
+def end_replay():
+    st.session_state.kpi = st.session_state.pop("kpi_real")
+    log("Fin de reproducción: KPIs reales restaurados","info")
 
 def graphviz_for_state() -> str:
     sim, cfg = st.session_state.sim, st.session_state.cfg
@@ -206,6 +589,10 @@ def graphviz_for_state() -> str:
     g.append("}")
     return "\\n".join(g)
 
+def cfg_slider(label: str, key: str):
+    _, lo, hi, step = CFG_SCHEMA[key]
+    return st.slider(label, lo, hi, st.session_state.cfg[key], step)
+
 st.title("SCADA SIS — Opción B (Smart‑relay)")
 
 tab_sim, tab_guide, tab_io, tab_bom, tab_comm, tab_sec, tab_ladder = st.tabs(
@@ -219,17 +606,18 @@ with tab_sim:
 
     with colL:
         st.subheader("Parámetros")
-        cfg["TEMP_START"] = st.slider("Temp. arranque", 5, 25, cfg["TEMP_START"], 1)
-        cfg["DT"] = st.slider("ΔT histeresis", 1, 10, cfg["DT"], 1)
+        cfg["TEMP_START"] = cfg_slider("Temp. arranque", "TEMP_START")
+        cfg["DT"] = cfg_slider("ΔT histeresis", "DT")
         st.caption(f"Temp. paro: **{cfg['TEMP_START']+cfg['DT']} °C**")
         colA, colB = st.columns(2)
         with colA:
-            cfg["MIN_RUNTIME_S"] = st.slider("Tiempo mínimo en marcha (s)", 10, 300, cfg["MIN_RUNTIME_S"], 10)
-            cfg["START_DEBOUNCE"] = st.slider("Debounce arranque (s)", 1, 10, cfg["START_DEBOUNCE"], 1)
+            cfg["MIN_RUNTIME_S"] = cfg_slider("Tiempo mínimo en marcha (s)", "MIN_RUNTIME_S")
+            cfg["START_DEBOUNCE"] = cfg_slider("Debounce arranque (s)", "START_DEBOUNCE")
         with colB:
-            cfg["STOP_DEBOUNCE"] = st.slider("Debounce paro (s)", 1, 15, cfg["STOP_DEBOUNCE"], 1)
+            cfg["STOP_DEBOUNCE"] = cfg_slider("Debounce paro (s)", "STOP_DEBOUNCE")
             cfg["noise"] = st.checkbox("Ruido sensor ±0.2°C", value=cfg["noise"])
         cfg["fast"] = st.checkbox("Velocidad x2", value=cfg["fast"])
+        cfg["predictive"] = st.checkbox("Arranque predictivo (tendencia)", value=cfg["predictive"])
 
         st.subheader("Simulación")
         sim["temp"] = st.slider("Temp. simulada (°C)", -5.0, 35.0, float(sim["temp"]), 0.5)
@@ -243,6 +631,32 @@ with tab_sim:
         with col3:
             if st.button("Paro"):
                 stop(True)
+        rcol1, rcol2 = st.columns([2,1])
+        with rcol1:
+            seed_in = st.number_input("Semilla RNG", 0, 2**32-1, st.session_state.rng["seed"], 1)
+        with rcol2:
+            if st.button("Reiniciar RNG"):
+                log(f"RNG reiniciado con semilla {rng_seed(int(seed_in))}","info")
+        last = st.session_state.get("last_a002")
+        snap_in = st.text_area("Reproducir ciclo (replay= del A002)", json.dumps(last) if last else "", height=80)
+        pcol1, pcol2 = st.columns(2)
+        with pcol1:
+            if st.button("Reproducir") and snap_in.strip():
+                try:
+                    snap = json.loads(snap_in)
+                    missing = [k for k in SNAP_SIM_KEYS + ("seed","rng","shown","mode","cfg") if k not in snap]
+                    errors = [f"Snapshot no válido: faltan {', '.join(missing)}"] if missing else validate_cfg(snap["cfg"])
+                except (ValueError, KeyError, TypeError) as e:
+                    errors = [f"Snapshot no válido: {e}"]
+                if errors:
+                    st.error("\n\n".join(errors))
+                else:
+                    replay_cycle(snap)
+                    st.rerun()
+        with pcol2:
+            if "kpi_real" in st.session_state and st.button("Finalizar reproducción"):
+                end_replay()
+                st.rerun()
 
         st.subheader("Fallos / pruebas")
         fcol1, fcol2, fcol3 = st.columns(3)
@@ -261,10 +675,45 @@ with tab_sim:
         if up is not None:
             try:
                 cfg_in = json.load(up)
-                st.session_state.cfg.update(cfg_in)
-                st.success("Configuración importada")
             except Exception as e:
                 st.error(f"Error importando JSON: {e}")
+                cfg_in = None
+            if isinstance(cfg_in, dict) and "units" in cfg_in:
+                # {"sets": {"invierno": {...}}, "units": {"U01": "invierno", "U02": {...}}}
+                resolved, errors = resolve_cfg_set(cfg_in["units"], cfg_in.get("sets", {}))
+                if errors:
+                    st.error("Lote no válido:\n\n" + "\n\n".join(errors))
+                else:
+                    new_units = [u for u in resolved if u not in st.session_state.fleet]
+                    st.caption(f"Lote para {len(resolved)} unidades"
+                               + (f" (nuevas: {', '.join(new_units)}, sobre valores por defecto)" if new_units else ""))
+                    diff = cfg_set_diff(st.session_state.fleet, resolved)
+                    if diff:
+                        st.dataframe(pd.DataFrame(diff), hide_index=True)
+                    if st.button("Aplicar lote"):
+                        errors = apply_cfg_set(st.session_state.fleet, cfg_in["units"], cfg_in.get("sets", {}))
+                        if errors:
+                            st.error("Lote rechazado, no se aplicó ningún cambio:\n\n" + "\n\n".join(errors))
+                        else:
+                            st.success(f"Configuración aplicada a {len(cfg_in['units'])} unidades")
+            elif cfg_in is not None:
+                errors = validate_cfg(cfg_in)
+                if errors:
+                    st.error("Configuración no válida:\n\n" + "\n\n".join(errors))
+                else:
+                    diff = cfg_diff(cfg, cfg_in)
+                    if diff:
+                        st.dataframe(pd.DataFrame(diff), hide_index=True)
+                        if st.button("Aplicar configuración"):
+                            cfg.update(cfg_in)
+                            st.success("Configuración importada")
+                    else:
+                        st.info("Sin cambios respecto a la configuración en marcha")
+        if len(st.session_state.fleet) > 1:
+            st.dataframe(pd.DataFrame.from_dict(st.session_state.fleet, orient="index"))
+            # same {"units": ...} layout as the batch import, so it can be re-applied
+            fleet_json = json.dumps({"units": st.session_state.fleet}, indent=2)
+            st.download_button("⬇ Exportar flota", data=fleet_json, file_name="sis-fleet.json", mime="application/json")
 
         st.subheader("LOG")
         st.text_area("Eventos", "\n".join(st.session_state.sim["alarms"]), height=260)
@@ -275,6 +724,31 @@ with tab_sim:
         st.metric("Batería", f"{sim['vbat']:.1f} V")
         st.metric("Estado", sim["fsm"])
 
+        st.subheader("KPIs de operación")
+        if "kpi_real" in st.session_state:
+            st.caption("Modo reproducción: KPIs de la reproducción; los reales se restauran al finalizar.")
+        ks = kpi_summary()
+        kc1, kc2, kc3, kc4 = st.columns(4)
+        kc1.metric("Horas de marcha", f"{ks['run_h']:.2f} h")
+        kc2.metric("Arranques", ks["starts"])
+        kc3.metric("Fallos / ciclo", f"{ks['failed_per_cycle']:.2f}")
+        kc4.metric("A002", ks["a002"])
+        kc5, kc6, kc7, kc8 = st.columns(4)
+        kc5.metric("MTBS", f"{ks['mtbs_s']:.0f} s" if ks["mtbs_s"] is not None else "—")
+        kc6.metric("Duty cycle", f"{ks['duty']*100:.1f} %")
+        kc7.metric(f"Bat. < {BAT_MIN} V", f"{ks['low_bat_s']} s")
+        kc8.metric("Ciclos cortos", ks["short_cycles"])
+
+        st.subheader("Reactivo vs predictivo")
+        ls = lead_summary()
+        st.dataframe(pd.DataFrame({
+            "Arranques": [ls[m]["starts"] for m in ls],
+            "Adelanto medio (s)": [round(ls[m]["lead_s"],1) if ls[m]["lead_s"] is not None else None for m in ls],
+            "Tasa arranques falsos": [f"{ls[m]['false_rate']*100:.0f} %" for m in ls],
+        }, index=list(ls)))
+        if sim["trendLevel"] is not None:
+            st.caption(f"Tendencia: {sim['trendSlope']:+.3f} °C/tick · previsión fin de arranque {trend_forecast(cfg):.1f} °C")
+
         st.subheader("Gráfica temperatura")
         st.line_chart(pd.DataFrame({"T": st.session_state.sim["hist"]}))
 